@@ -8,90 +8,644 @@ scripts using a local language model.
 
 import os
 import argparse
+import ast
+import glob
+import hashlib
+import io
 import json
+import mmap
+import re
+import stat
 import sys
-from typing import Dict, Optional
-from bardapi import Bard
-from dotenv import load_dotenv
+import tempfile
+import threading
+from functools import lru_cache, partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Final, List, Optional, Union
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+# bardapi, python-dotenv, asyncio and orjson are imported on first use so that `--help` and
+# argument errors don't pay for loading the HTTP stack
+
+_DOTENV_LOADED = False
+
+DEFAULT_CACHE_DIR = "~/.meeting_scripts_cache"
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_LEADING_WS = re.compile(r'^[ \t]+')
+# Bytes that matter when checking bracket balance: comments, quotes and brackets
+_SCAN_RE = re.compile(r'#|"""|\'\'\'|["\'()\[\]{}]')
+_CLOSING_BRACKETS = {')': '(', ']': '[', '}': '{'}
+# Code fences; an unterminated fence runs to the end of the text
+_PYTHON_FENCE_RE = re.compile(r'```python3?(?!\w)[ \t]*\n?(.*?)(?:```|\Z)', re.DOTALL)
+# Any fence, dropping a language tag on the opening line
+_FENCE_RE = re.compile(r'```(?:[\w+#.-]*[ \t]*\n)?(.*?)(?:```|\Z)', re.DOTALL)
+
+# Generated code with at least this many lines uses the Numba or NumPy indentation fixer
+_FAST_INDENT_MIN_LINES = 2000
+
+# Prompt per --script-type; the notes are appended after a blank line
+_PROMPTS: Final[Dict[str, str]] = {
+    "script": """You are an expert Python developer. Your task is to create a complete, 
+functional Python script based on the provided requirements. Follow these guidelines:
+
+1. Generate ONLY the Python code - no explanations, markdown, or additional text
+2. Start with '#!/usr/bin/env python3' shebang
+3. Include all necessary imports at the top
+4. Implement the functionality described in the meeting notes
+5. Add clear docstrings and comments
+6. Include proper error handling with try/except blocks
+7. Follow PEP 8 style guide strictly
+8. Make sure the code is self-contained and can run independently
+9. Include 'if __name__ == "__main__":' block if appropriate
+10. Add type hints for function parameters and return values
+11. Include example usage in docstrings
+12. Add input validation where appropriate
+
+Here are the meeting notes to base the script on:
+""",
+    "module": """You are an expert Python developer. Your task is to create a complete, 
+importable Python module based on the provided requirements. Follow these guidelines:
+
+1. Generate ONLY the Python code - no explanations, markdown, or additional text
+2. Start with a module docstring describing what the module provides
+3. Include all necessary imports at the top
+4. Implement the functionality described in the meeting notes as reusable functions and classes
+5. Define __all__ listing the public API
+6. Do not run any code at import time; no 'if __name__ == "__main__":' block
+7. Raise exceptions with clear messages instead of printing errors or exiting
+8. Follow PEP 8 style guide strictly
+9. Add clear docstrings and comments
+10. Add type hints for function parameters and return values
+11. Include example usage in docstrings
+12. Add input validation where appropriate
+
+Here are the meeting notes to base the module on:
+""",
+    "class": """You are an expert Python developer. Your task is to create a complete, 
+well-designed Python class based on the provided requirements. Follow these guidelines:
+
+1. Generate ONLY the Python code - no explanations, markdown, or additional text
+2. Define one main class that models the functionality described in the meeting notes
+3. Include all necessary imports at the top
+4. Keep state in instance attributes initialized in __init__
+5. Expose behaviour through well-named public methods; prefix helpers with an underscore
+6. Add a class docstring and a docstring for every public method
+7. Include proper error handling and raise exceptions with clear messages
+8. Follow PEP 8 style guide strictly
+9. Add type hints for method parameters and return values
+10. Include example usage in the class docstring
+11. Add input validation where appropriate
+12. Do not include an 'if __name__ == "__main__":' block
+
+Here are the meeting notes to base the class on:
+""",
+}
+_PROMPT_BYTES: Final[Dict[str, bytes]] = {
+    script_type: prompt.encode('utf-8') for script_type, prompt in _PROMPTS.items()
+}
+# SHA-256 state after each prompt; copy() and feed the notes to hash prompt + notes
+_PROMPT_HASHES: Final = {
+    script_type: hashlib.sha256(prompt) for script_type, prompt in _PROMPT_BYTES.items()
+}
+
+_SUMMARY_PROMPT: Final[str] = """Summarize the following part of a set of meeting notes. Keep every
+requirement, decision, name, number and action item; drop small talk and repetition.
+Reply with the summary only.
+
+"""
+
+# Notes longer than this are trimmed before they are sent to the model
+DEFAULT_MAX_NOTE_TOKENS = 6000
+# Smallest budget that keeps at least one token from each end of the notes
+MIN_NOTE_TOKENS = 2
+# Rough token size used when tiktoken is not installed
+_CHARS_PER_TOKEN = 4
+
+
+def _fix_indent_kernel(buf, out) -> int:
+    """Copy buf into out, padding each line's leading whitespace to a multiple of 4 spaces.
+
+    Operates on uint8 arrays so it can be compiled with Numba. out must hold
+    len(buf) + 3 bytes per line. Returns the number of bytes written.
+    """
+    n = len(buf)
+    i = 0
+    j = 0
+    while i < n:
+        lead = 0
+        while i < n and (buf[i] == 32 or buf[i] == 9):
+            lead += 1
+            i += 1
+        for _ in range((lead + 3) // 4 * 4):
+            out[j] = 32
+            j += 1
+        while i < n:
+            c = buf[i]
+            out[j] = c
+            j += 1
+            i += 1
+            if c == 10:
+                break
+    return j
+
+
+@lru_cache(maxsize=None)
+def _get_jit_fix_indent():
+    """Return the Numba-compiled indentation fixer, or None if Numba is unavailable."""
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    # cache=True keeps the compiled kernel on disk, so the JIT cost is paid once
+    return njit(cache=True)(_fix_indent_kernel)
+
+
+def _fix_indentation_numpy(np, buf):
+    """Vectorized equivalent of _fix_indent_kernel; returns the rewritten uint8 array."""
+    n = len(buf)
+    # Line i spans starts[i]:ends[i], including its trailing newline
+    newlines = np.flatnonzero(buf == 10)
+    starts = np.concatenate(([0], newlines + 1))
+    ends = np.append(newlines + 1, n)
+    # Leading whitespace ends at the first other byte; every line but the last has a newline
+    other = np.append(np.flatnonzero((buf != 32) & (buf != 9)), n)
+    first = other[np.searchsorted(other, starts)]
+    lead = first - starts
+    pad = (lead + 3) // 4 * 4
+
+    out_lengths = pad + (ends - first)
+    out_starts = np.concatenate(([0], np.cumsum(out_lengths)[:-1]))
+    out = np.full(int(out_lengths.sum()), 32, dtype=np.uint8)
+
+    # Copy everything after each line's leading whitespace behind its padding
+    line_of = np.repeat(np.arange(len(starts)), ends - starts)
+    kept = np.flatnonzero(np.arange(n) >= first[line_of])
+    kept_lines = line_of[kept]
+    out[out_starts[kept_lines] + pad[kept_lines] + (kept - first[kept_lines])] = buf[kept]
+    return out
+
+
+def _fix_indentation(code: str) -> str:
+    """Pad leading whitespace on every line up to a multiple of 4 spaces."""
+    line_count = code.count('\n') + 1
+    if line_count >= _FAST_INDENT_MIN_LINES:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        if np is not None:
+            buf = np.frombuffer(code.encode('utf-8'), dtype=np.uint8)
+            fix_indent = _get_jit_fix_indent()
+            if fix_indent is not None:
+                out = np.empty(len(buf) + 3 * line_count, dtype=np.uint8)
+                size = fix_indent(buf, out)
+                return out[:size].tobytes().decode('utf-8')
+            return _fix_indentation_numpy(np, buf).tobytes().decode('utf-8')
+
+    return '\n'.join(
+        _LEADING_WS.sub(lambda m: ' ' * ((len(m.group(0)) + 3) // 4 * 4), line)
+        for line in code.split('\n')
+    )
+
+
+def _find_unescaped(code: str, quote: str, pos: int) -> int:
+    """Return the index of the next quote at or after pos that is not backslash-escaped."""
+    while True:
+        end = code.find(quote, pos)
+        if end < 0:
+            return end
+        backslashes = 0
+        while end - backslashes > 0 and code[end - backslashes - 1] == '\\':
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return end
+        pos = end + 1
+
+
+def _looks_parseable(code: str) -> bool:
+    """
+    Cheap check for code that re-indenting can't repair.
+    
+    Returns False only for unbalanced or mismatched brackets and unterminated
+    triple-quoted strings. Only used on code ast.parse already rejected; a True
+    result still has to be confirmed by parsing the fixed code.
+    """
+    stack = []
+    pos = 0
+    while True:
+        match = _SCAN_RE.search(code, pos)
+        if match is None:
+            return not stack
+        token = match.group(0)
+        pos = match.end()
+        if token == '#':
+            pos = code.find('\n', pos)
+            if pos < 0:
+                return not stack
+        elif len(token) == 3:
+            end = _find_unescaped(code, token, pos)
+            if end < 0:
+                return False
+            pos = end + 3
+        elif token in ('"', "'"):
+            # Single-line string, which a backslash can continue onto the next line;
+            # leave an unterminated one for ast.parse to report
+            end = _find_unescaped(code, token, pos)
+            newline = _find_unescaped(code, '\n', pos)
+            if end < 0 or 0 <= newline < end:
+                if newline < 0:
+                    return not stack
+                pos = newline
+            else:
+                pos = end + 1
+        elif token in _CLOSING_BRACKETS:
+            if not stack or stack.pop() != _CLOSING_BRACKETS[token]:
+                return False
+        else:
+            stack.append(token)
+
+
+@lru_cache(maxsize=1)
+def _get_dumps():
+    """Return the JSON serializer: orjson when installed, else the json module."""
+    try:
+        import orjson
+    except ImportError:
+        return lambda obj: json.dumps(obj, indent=2).encode('utf-8')
+    return lambda obj: orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+
+def _dumps(obj) -> bytes:
+    """Serialize obj to indented UTF-8 JSON."""
+    return _get_dumps()(obj)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write data to a temporary file beside path, then move it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Never leave a half-written file behind
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _load_dotenv() -> None:
+    """Load environment variables from .env once per process."""
+    global _DOTENV_LOADED
+    if not _DOTENV_LOADED:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _DOTENV_LOADED = True
+
+
+# Keep-alive connections per host in the shared HTTP session; enough for batch mode
+_HTTP_POOL_SIZE = 20
+
+
+@lru_cache(maxsize=4)
+def _get_session(token: str):
+    """Return the pooled requests session for this token, shared by all threads."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from bardapi.constants import SESSION_HEADERS
+
+    session = requests.Session()
+    session.headers = dict(SESSION_HEADERS)
+    session.cookies.set("__Secure-1PSID", token)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    return session
+
+
+# Per-thread Bard clients: token -> client
+_BARD_CLIENTS = threading.local()
+
+
+def _get_bard(token: str):
+    """
+    Return this thread's Bard client for the token, reused across generator instances.
+    
+    bardapi keeps conversation state on the client, so threads never share one;
+    they only share the pooled session.
+    """
+    clients = getattr(_BARD_CLIENTS, "clients", None)
+    if clients is None:
+        clients = _BARD_CLIENTS.clients = {}
+    bard = clients.get(token)
+    if bard is None:
+        from bardapi import Bard
+        bard = clients[token] = Bard(token=token, session=_get_session(token))
+    return bard
+
+
+def _extract_code(response_text: str) -> str:
+    """Extract the first python code block, else the first fenced block, else the whole text."""
+    match = _PYTHON_FENCE_RE.search(response_text) or _FENCE_RE.search(response_text)
+    return match.group(1).strip() if match else response_text.strip()
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Return the cl100k_base tokenizer, or None if tiktoken is unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding("cl100k_base")
+
+
+def _count_tokens(text: str) -> int:
+    """Count tokens in text, estimating from its length without tiktoken."""
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // _CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _split_notes(notes: str, max_tokens: int) -> List[str]:
+    """Split notes into consecutive chunks of at most max_tokens tokens."""
+    encoding = _get_encoding()
+    if encoding is None:
+        size = max_tokens * _CHARS_PER_TOKEN
+        return [notes[i:i + size] for i in range(0, len(notes), size)]
+    ids = encoding.encode(notes, disallowed_special=())
+    return [encoding.decode(ids[i:i + max_tokens]) for i in range(0, len(ids), max_tokens)]
+
+
+def _truncate_notes(notes: str, max_tokens: int = DEFAULT_MAX_NOTE_TOKENS) -> str:
+    """Keep only the first and last max_tokens // 2 tokens of notes that are too long."""
+    half = max_tokens // 2
+    encoding = _get_encoding()
+    if encoding is None:
+        if len(notes) <= max_tokens * _CHARS_PER_TOKEN:
+            return notes
+        head = notes[:half * _CHARS_PER_TOKEN]
+        tail = notes[len(notes) - half * _CHARS_PER_TOKEN:]
+    else:
+        ids = encoding.encode(notes, disallowed_special=())
+        if len(ids) <= max_tokens:
+            return notes
+        head = encoding.decode(ids[:half])
+        tail = encoding.decode(ids[len(ids) - half:])
+    return "".join((head, "\n[...]\n", tail))
+
+
+class ResponseCache:
+    """Cache of generated code keyed on the script type and meeting notes.
+
+    Exact matches are looked up by the SHA-256 of the type's prompt + notes.
+    When sentence-transformers is installed, notes that are semantically
+    equivalent to a cached entry of the same type (cosine similarity above
+    ``threshold``) are served from the cache as well.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, threshold: float = 0.95):
+        """Load the cache index from disk.
+
+        Args:
+            cache_dir: Cache directory (default: MEETING_SCRIPTS_CACHE_DIR from .env
+                or ~/.meeting_scripts_cache)
+            threshold: Minimum cosine similarity for a semantic cache hit
+        """
+        self.cache_dir = Path(
+            cache_dir or os.getenv("MEETING_SCRIPTS_CACHE_DIR", DEFAULT_CACHE_DIR)
+        ).expanduser()
+        self.threshold = threshold
+        self._index_path = self.cache_dir / "index.json"
+        self._embeddings_path = self.cache_dir / "embeddings.npz"
+
+        # hash -> script file name (relative to cache_dir)
+        self.index: Dict[str, str] = {}
+        # Row i of self._embeddings belongs to self._keys[i], generated as self._kinds[i]
+        self._keys: List[str] = []
+        self._kinds: List[str] = []
+        self._embeddings = None
+        self._model = None
+        self._semantic = True
+        # Embeddings computed by get() on a miss, reused by the matching put()
+        self._pending: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+        try:
+            with open(self._index_path, 'r', encoding='utf-8') as file:
+                self.index = json.load(file)
+        except Exception:
+            self.index = {}
+
+    @staticmethod
+    def key(notes: str, script_type: str = "script", options: str = "") -> str:
+        """Return the exact-match key; compute it once and pass it to get() and put()."""
+        hasher = _PROMPT_HASHES[script_type].copy()
+        hasher.update(f"\0{options}\0".encode('utf-8'))
+        hasher.update(notes.encode('utf-8'))
+        return hasher.hexdigest()
+
+    @staticmethod
+    def kind(script_type: str = "script", options: str = "") -> str:
+        """Return the label that semantic matches must share."""
+        return f"{script_type}:{options}" if options else script_type
+
+    def _get_model(self):
+        """Return the embedding model, or None if sentence-transformers is unavailable."""
+        with self._lock:
+            if self._model is None and self._semantic:
+                try:
+                    import numpy as np
+                    from sentence_transformers import SentenceTransformer
+                except ImportError:
+                    self._semantic = False
+                    return None
+                try:
+                    # May download the model on first use, which fails when offline
+                    self._model = SentenceTransformer(EMBEDDING_MODEL)
+                except Exception:
+                    self._semantic = False
+                    return None
+                try:
+                    with np.load(self._embeddings_path) as data:
+                        self._keys = [str(k) for k in data["keys"]]
+                        self._embeddings = data["embeddings"]
+                        # Caches written before script types were stored only hold 'script' entries
+                        self._kinds = ([str(k) for k in data["kinds"]] if "kinds" in data
+                                       else ["script"] * len(self._keys))
+                except Exception:
+                    # A missing, truncated or foreign file just means an empty cache
+                    self._keys, self._kinds, self._embeddings = [], [], None
+            return self._model
+
+    def _encode(self, notes: str):
+        """Embed the notes, or return None if semantic matching is unavailable."""
+        model = self._get_model()
+        if model is None:
+            return None
+        try:
+            return model.encode(notes, normalize_embeddings=True)
+        except Exception:
+            self._semantic = False
+            return None
+
+    def _read(self, key: str) -> Optional[str]:
+        name = self.index.get(key)
+        if name is None:
+            return None
+        try:
+            with open(self.cache_dir / name, 'r', encoding='utf-8') as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def get(self, key: str, notes: str, kind: str) -> Optional[str]:
+        """
+        Return the cached code for these notes, or None on a miss.
+        
+        Args:
+            key: ResponseCache.key() of the notes
+            notes: The meeting notes, embedded for semantic matching
+            kind: ResponseCache.kind(); only entries of the same kind match
+        """
+        cached = self._read(key)
+        if cached is not None:
+            return cached
+
+        embedding = self._encode(notes)
+        if embedding is None:
+            return None
+        with self._lock:
+            self._pending[key] = embedding
+            keys, kinds, embeddings = self._keys, self._kinds, self._embeddings
+        if embeddings is None or not len(keys):
+            return None
+        sims = embeddings @ embedding
+        # Only entries of the requested type and options can match
+        sims[[entry_kind != kind for entry_kind in kinds]] = -1.0
+        best = int(sims.argmax())
+        if sims[best] > self.threshold:
+            return self._read(keys[best])
+        return None
+
+    def put(self, key: str, notes: str, script: str, kind: str) -> None:
+        """Store generated code under the key and kind passed to the preceding get()."""
+        name = f"{key}.py"
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            _write_atomic(self.cache_dir / name, script.encode('utf-8'))
+            with self._lock:
+                self.index[key] = name
+                _write_atomic(self._index_path, _dumps(self.index))
+
+            with self._lock:
+                embedding = self._pending.pop(key, None)
+            if embedding is None:
+                embedding = self._encode(notes)
+            if embedding is None:
+                return
+            import numpy as np
+            row = np.asarray(embedding, dtype=np.float32)[np.newaxis, :]
+            with self._lock:
+                if key in self._keys:
+                    return
+                self._embeddings = row if self._embeddings is None else np.vstack((self._embeddings, row))
+                self._keys = self._keys + [key]
+                self._kinds = self._kinds + [kind]
+                buffer = io.BytesIO()
+                np.savez(buffer, keys=np.array(self._keys),
+                         kinds=np.array(self._kinds), embeddings=self._embeddings)
+                _write_atomic(self._embeddings_path, buffer.getvalue())
+        except Exception:
+            # The cache is an optimization; never fail generation because of it
+            pass
+
+
+@lru_cache(maxsize=4)
+def _get_response_cache(cache_dir: Optional[str]) -> ResponseCache:
+    """Return the ResponseCache for this directory, shared across generator instances."""
+    return ResponseCache(cache_dir)
 
-# Load environment variables
-load_dotenv()
 
 class MeetingScriptGenerator:
-    def __init__(self, api_key: Optional[str] = None, model: str = "bard"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "bard",
+                 use_cache: bool = True, max_note_tokens: int = DEFAULT_MAX_NOTE_TOKENS,
+                 summarize_long_notes: bool = False):
         """Initialize the MeetingScriptGenerator with Bard API.
         
         Args:
             api_key: Bard API key (optional, will use BARD_API_KEY from .env if not provided)
             model: For compatibility, not used with Bard
+            use_cache: Reuse previously generated code for identical or similar notes
+            max_note_tokens: Longer notes keep only their beginning and end
+            summarize_long_notes: Summarize notes longer than max_note_tokens chunk by
+                chunk before truncating (one extra API call per chunk)
         """
+        # Check the arguments before creating a client, which contacts Bard
+        if max_note_tokens < MIN_NOTE_TOKENS:
+            raise ValueError(f"max_note_tokens must be at least {MIN_NOTE_TOKENS}")
+
+        _load_dotenv()
+
         self.api_key = api_key or os.getenv("BARD_API_KEY")
         if not self.api_key:
             raise ValueError(
                 "Bard API key not provided. Set BARD_API_KEY in .env file or pass as argument"
             )
         
-        # Initialize Bard with the API key
-        self.bard = Bard(token=self.api_key)
+        # Create this thread's client now so a bad key fails here; _ask fetches
+        # the client for whichever thread it runs on
+        _get_bard(self.api_key)
         self.model = "Bard"
+        self.max_note_tokens = max_note_tokens
+        self.summarize_long_notes = summarize_long_notes
+        # Settings that change the prompt for the same notes, part of every cache key
+        self._cache_options = f"max_note_tokens={max_note_tokens};summarize={int(summarize_long_notes)}"
+        self.cache = _get_response_cache(os.getenv("MEETING_SCRIPTS_CACHE_DIR")) if use_cache else None
     
 
 
     def read_meeting_notes(self, file_path: str) -> str:
         """Read meeting notes from a text file."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                return file.read()
+            with open(file_path, 'rb') as file:
+                info = os.fstat(file.fileno())
+                # Pipes, FIFOs and /proc files report size 0 and can't be mapped
+                if not stat.S_ISREG(info.st_mode) or info.st_size == 0:
+                    return file.read().decode('utf-8')
+                # Decode straight from the mapped pages instead of reading into a bytes copy first
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return str(mapped, 'utf-8')
         except FileNotFoundError:
             raise FileNotFoundError(f"Meeting notes file not found: {file_path}")
         except Exception as e:
             raise Exception(f"Error reading meeting notes: {str(e)}")
 
-    def _validate_python_code(self, code: str) -> str:
-        """
-        Validate and clean the generated Python code.
-        
-        Args:
-            code: The generated Python code
-            
-        Returns:
-            str: Validated and cleaned Python code
-        """
-        # Remove any markdown code blocks
-        if "```python" in code:
-            code = code.split("```python")[1].split("```")[0].strip()
-        elif "```" in code:
-            code = code.split("```")[1].strip()
-            
-        # Remove any leading/trailing whitespace
-        code = code.strip()
-        
-        # Ensure it starts with a shebang if it's a script
-        if not code.startswith("#!"):
-            code = "#!/usr/bin/env python3\n\n" + code
-            
-        # Basic syntax check
+    def _check_python_code(self, code: str) -> Optional[str]:
+        """Return the code if it parses, re-indented if that was needed, or None."""
         try:
-            compile(code, "<string>", "exec")
+            ast.parse(code)
             return code
         except SyntaxError as e:
-            # Try to fix common indentation issues
-            try:
-                import re
-                # Fix inconsistent indentation
-                lines = code.split('\n')
-                fixed_lines = []
-                for line in lines:
-                    # Remove any leading spaces that aren't multiples of 4
-                    fixed_line = re.sub(r'^\s+', lambda m: ' ' * (len(m.group(0)) // 4 * 4), line)
-                    fixed_lines.append(fixed_line)
-                fixed_code = '\n'.join(fixed_lines)
-                compile(fixed_code, "<string>", "exec")
-                return fixed_code
-            except:
-                # If we can't fix it, return the original with an error comment
-                return f"""#!/usr/bin/env python3
-# WARNING: Generated code contains syntax errors
+            # Try to fix common indentation issues, unless the brackets or
+            # strings are broken too and re-indenting can't help
+            if isinstance(e, IndentationError) and _looks_parseable(code):
+                fixed_code = _fix_indentation(code)
+                try:
+                    ast.parse(fixed_code)
+                    return fixed_code
+                except (SyntaxError, ValueError):
+                    pass
+        return None
+
+    def _flag_syntax_errors(self, code: str) -> str:
+        """Return code we can't fix, prefixed with an error comment."""
+        return f"""# WARNING: Generated code contains syntax errors
 # Please review and fix the following code:
 
 {code}
@@ -99,116 +653,277 @@ class MeetingScriptGenerator:
 
     def _extract_code_from_response(self, response_text: str) -> str:
         """Extract code block from the model's response."""
-        if '```python' in response_text:
-            return response_text.split('```python')[1].split('```')[0].strip()
-        elif '```' in response_text:
-            return response_text.split('```')[1].strip()
-        return response_text.strip()
+        return _extract_code(response_text)
+
+    def _ask(self, prompt: str) -> Optional[Dict]:
+        """Send a prompt to Bard as the first turn of a new conversation."""
+        bard = _get_bard(self.api_key)
+        # Prompts are independent; don't send this one as a follow-up to the last answer
+        bard.conversation_id = bard.response_id = bard.choice_id = ""
+        return bard.get_answer(prompt)
+
+    def _prepare_notes(self, meeting_notes: str) -> str:
+        """Bring the notes within max_note_tokens before they are sent to the model."""
+        if self.summarize_long_notes and _count_tokens(meeting_notes) > self.max_note_tokens:
+            summaries = []
+            for chunk in _split_notes(meeting_notes, self.max_note_tokens):
+                response = self._ask("".join((_SUMMARY_PROMPT, chunk)))
+                if not response or 'content' not in response:
+                    raise Exception("No summary generated from the model")
+                summaries.append(response['content'].strip())
+            meeting_notes = "\n\n".join(summaries)
+        return _truncate_notes(meeting_notes, self.max_note_tokens)
+
+    def _generate_code(self, meeting_notes: str, script_type: str) -> str:
+        """Return generated code for the notes, from the cache or from Bard."""
+        prompt = _PROMPTS.get(script_type)
+        if prompt is None:
+            raise ValueError(f"Unknown script type: {script_type}")
+        code = None
+        if self.cache:
+            # Hash the notes once for both the lookup and the store
+            key = self.cache.key(meeting_notes, script_type, self._cache_options)
+            kind = self.cache.kind(script_type, self._cache_options)
+            code = self.cache.get(key, meeting_notes, kind)
+        # An empty entry can only come from an older cache; treat it as a miss
+        if not code:
+            # Send the prompt to Bard
+            response = self._ask(
+                "".join((prompt, "\n\n", self._prepare_notes(meeting_notes)))
+            )
+            if not response or 'content' not in response:
+                raise Exception("No response generated from the model")
+            code = self._extract_code_from_response(response['content'])
+            # The header supplies the shebang
+            if code.startswith("#!"):
+                code = code.partition("\n")[2].lstrip("\n")
+            if not code:
+                raise Exception("No response generated from the model")
+            checked = self._check_python_code(code)
+            if checked is None:
+                # Don't cache broken output; the next run gets a fresh attempt
+                return self._flag_syntax_errors(code)
+            code = checked
+            if self.cache:
+                self.cache.put(key, meeting_notes, code, kind)
+        return code
+
+    def _make_header(self, now: Optional["datetime"] = None) -> str:
+        """Return the header comment added to every generated script."""
+        if now is None:
+            from datetime import datetime
+            now = datetime.now()
+        return f"""#!/usr/bin/env python3
+# Generated on: {now.strftime('%Y-%m-%d %H:%M:%S')}
+# Model: {self.model}
+# Source: Meeting notes
+
+"""
 
-    def generate_script(self, meeting_notes: str, script_type: str = "script") -> Dict:
+    def generate_script(self, meeting_notes: str, script_type: str = "script",
+                        now: Optional["datetime"] = None) -> Dict:
         """
         Generate a Python script based on meeting notes using Bard API.
         
         Args:
             meeting_notes (str): The content of the meeting notes
             script_type (str): Type of script to generate ('script', 'module', or 'class')
+            now (datetime): Generation time for the header (default: current time)
             
         Returns:
             dict: Response containing the generated Python script
         """
-        prompt = """You are an expert Python developer. Your task is to create a complete, 
-functional Python script based on the provided requirements. Follow these guidelines:
-
-1. Generate ONLY the Python code - no explanations, markdown, or additional text
-2. Start with '#!/usr/bin/env python3' shebang
-3. Include all necessary imports at the top
-4. Implement the functionality described in the meeting notes
-5. Add clear docstrings and comments
-6. Include proper error handling with try/except blocks
-7. Follow PEP 8 style guide strictly
-8. Make sure the code is self-contained and can run independently
-9. Include 'if __name__ == "__main__":' block if appropriate
-10. Add type hints for function parameters and return values
-11. Include example usage in docstrings
-12. Add input validation where appropriate
+        try:
+            code = self._generate_code(meeting_notes, script_type)
+            return {"script": "".join((self._make_header(now), code))}
+        except Exception as e:
+            raise Exception(f"Script generation failed: {str(e)}")
 
-Here are the meeting notes to base the script on:
-"""
+    async def generate_script_async(self, meeting_notes: str, script_type: str = "script",
+                                    now: Optional["datetime"] = None) -> Dict:
+        """Run generate_script in the default executor so calls can overlap."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, partial(self.generate_script, meeting_notes, script_type, now)
+        )
 
-        try:
-            # Send the prompt to Bard
-            response = self.bard.get_answer(
-                f"{prompt}\n\n{meeting_notes}"
-            )
+    async def process_batch(self, notes_list: List[str], script_type: str = "script",
+                            now: Optional["datetime"] = None) -> List[Union[Dict, Exception]]:
+        """
+        Generate scripts for several meeting notes concurrently.
+        
+        At most MAX_CONCURRENCY (from .env, default 5) Bard calls run at once.
+        
+        Args:
+            notes_list: Contents of the meeting notes, one entry per script
+            script_type: Type of script to generate ('script', 'module', or 'class')
+            now: Generation time for the headers (default: current time)
             
-            if response and 'content' in response:
-                code = self._extract_code_from_response(response['content'])
-                
-                # Add a header with generation info
-                from datetime import datetime
-                header = f"""#!/usr/bin/env python3
-# Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-# Model: {self.model}
-# Source: Meeting notes
+        Returns:
+            list: Script data for each entry, in order, or the exception raised for it
+        """
+        import asyncio
+        semaphore = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENCY", "5")))
 
-"""
-                
-                return {"script": header + code}
-            else:
-                raise Exception("No response generated from the model")
-                
-        except Exception as e:
-            raise Exception(f"Script generation failed: {str(e)}")
+        async def controlled_generate(notes: str) -> Dict:
+            async with semaphore:
+                return await self.generate_script_async(notes, script_type, now)
+
+        return await asyncio.gather(
+            *[controlled_generate(notes) for notes in notes_list],
+            return_exceptions=True
+        )
 
     def save_script(self, script_data: Dict, output_path: str) -> None:
         """Save the generated script to a file."""
         try:
-            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
-            with open(output_path, 'w', encoding='utf-8') as file:
-                if 'script' in script_data:
-                    file.write(script_data['script'])
-                else:
-                    json.dump(script_data, file, indent=2)
+            path = Path(output_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if 'script' in script_data:
+                path.write_bytes(script_data['script'].encode('utf-8'))
+            else:
+                path.write_bytes(_dumps(script_data))
             print(f"Script successfully saved to: {output_path}")
         except Exception as e:
             raise Exception(f"Error saving script: {str(e)}")
 
-def main():
-    parser = argparse.ArgumentParser(description='Generate Python scripts from meeting notes using Google\'s Bard API')
-    parser.add_argument('input_file', help='Path to the input text file with meeting notes')
-    parser.add_argument('-o', '--output', default=None,
-                      help='Output file path for the generated script (default: generated_script_<timestamp>.py)')
-    
-    # Bard API options
-    parser.add_argument('--api-key', default=None, help='Bard API key (default: use BARD_API_KEY from .env)')
+
+def _resolve_input_files(input_path: str) -> List[str]:
+    """Expand a file, directory (its *.txt files) or glob pattern into input files."""
+    if os.path.isdir(input_path):
+        return sorted(glob.glob(os.path.join(input_path, '*.txt')))
+    if any(c in input_path for c in '*?['):
+        return sorted(path for path in glob.glob(input_path) if os.path.isfile(path))
+    return [input_path]
+
+
+def _run_batch(generator: MeetingScriptGenerator, input_files: List[str],
+               script_type: str, output_dir: str) -> int:
+    """Generate and save one script per input file concurrently."""
+    import asyncio
+    from datetime import datetime
+
+    # One timestamp for every header and file name in the batch
+    now = datetime.now()
+
+    print(f"Reading meeting notes from {len(input_files)} files")
+    notes_list = [generator.read_meeting_notes(path) for path in input_files]
+
+    print("Generating scripts... (this may take a moment)")
+    results = asyncio.run(generator.process_batch(notes_list, script_type, now))
+
+    timestamp = now.strftime("%Y%m%d_%H%M%S")
+    failures = 0
+    for input_path, result in zip(input_files, results):
+        if isinstance(result, Exception):
+            failures += 1
+            print(f"Failed to generate script for {input_path}: {result}", file=sys.stderr)
+            continue
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        output_path = os.path.join(output_dir, f"generated_script_{stem}_{timestamp}.py")
+        generator.save_script(result, output_path)
+
+    print(f"\nGenerated {len(input_files) - failures} of {len(input_files)} scripts")
+    return 1 if failures else 0
+
+
+_SETUP_HELP: Final[str] = (
+    "\nMake sure you have:"
+    "\n1. Set the BARD_API_KEY environment variable"
+    "\n2. Installed the required packages: pip install -r requirements.txt"
+    "\n3. Have a stable internet connection"
+    "\n\nTo get a Bard API key:"
+    "\n1. Go to https://bard.google.com/"
+    "\n2. Sign in with your Google account"
+    "\n3. Open browser developer tools (F12)"
+    "\n4. Go to Application > Cookies"
+    "\n5. Find the cookie named '__Secure-1PSID'"
+    "\n6. Copy its value and set it as BARD_API_KEY"
+    "\n   in your environment: export BARD_API_KEY='your-key-here'"
+    "\n   or in a .env file: BARD_API_KEY=your-key-here"
+)
+
+_PARSER: Optional[argparse.ArgumentParser] = None
+
+
+def _note_token_budget(value: str) -> int:
+    """Parse --max-note-tokens, rejecting budgets too small to keep both ends of the notes."""
+    try:
+        tokens = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if tokens < MIN_NOTE_TOKENS:
+        raise argparse.ArgumentTypeError(f"must be at least {MIN_NOTE_TOKENS}, got {tokens}")
+    return tokens
+
+
+def _get_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser on first use and reuse it afterwards."""
+    global _PARSER
+    if _PARSER is None:
+        parser = argparse.ArgumentParser(description='Generate Python scripts from meeting notes using Google\'s Bard API')
+        parser.add_argument('input_file',
+                          help='Path to the input text file with meeting notes, '
+                               'or a directory/glob pattern to process several files')
+        parser.add_argument('-o', '--output', default=None,
+                          help='Output file path for the generated script (default: generated_script_<timestamp>.py); '
+                               'output directory when processing several files')
+
+        # Bard API options
+        parser.add_argument('--api-key', default=None, help='Bard API key (default: use BARD_API_KEY from .env)')
+
+        # Script options
+        parser.add_argument('--script-type', default='script',
+                          choices=list(_PROMPTS),
+                          help='Type of Python code to generate (script, module, or class)')
+        parser.add_argument('--no-cache', action='store_true',
+                          help='Always call the Bard API instead of reusing cached scripts')
+        parser.add_argument('--max-note-tokens', type=_note_token_budget, default=DEFAULT_MAX_NOTE_TOKENS,
+                          help='Trim longer notes to their beginning and end (default: %(default)s)')
+        parser.add_argument('--summarize', action='store_true',
+                          help='Summarize notes longer than --max-note-tokens before generating')
+        _PARSER = parser
+    return _PARSER
+
+
+def main(argv: Optional[List[str]] = None):
+    args = _get_parser().parse_args(argv)
     
-    # Script options
-    parser.add_argument('--script-type', default='script',
-                      choices=['script', 'module', 'class'],
-                      help='Type of Python code to generate (script, module, or class)')
+    # Load environment variables
+    _load_dotenv()
     
     # Output directory from .env or default to current directory
     output_dir = os.getenv('OUTPUT_DIR', 'output_scripts')
     
-    args = parser.parse_args()
-    
     try:
         # Initialize the generator
         print("Using Google's Bard API")
-        generator = MeetingScriptGenerator(api_key=args.api_key)
+        generator = MeetingScriptGenerator(api_key=args.api_key,
+                                           use_cache=not args.no_cache,
+                                           max_note_tokens=args.max_note_tokens,
+                                           summarize_long_notes=args.summarize)
+        
+        input_files = _resolve_input_files(args.input_file)
+        if not input_files:
+            raise FileNotFoundError(f"No meeting notes files found: {args.input_file}")
+        if len(input_files) > 1:
+            return _run_batch(generator, input_files, args.script_type,
+                              args.output or output_dir)
         
         # Read meeting notes
-        print(f"Reading meeting notes from: {args.input_file}")
-        meeting_notes = generator.read_meeting_notes(args.input_file)
+        print(f"Reading meeting notes from: {input_files[0]}")
+        meeting_notes = generator.read_meeting_notes(input_files[0])
         
-        # Generate script
+        # Generate script; the header and default file name share one timestamp
+        from datetime import datetime
+        now = datetime.now()
         print("Generating script... (this may take a moment)")
-        script_data = generator.generate_script(meeting_notes, args.script_type)
+        script_data = generator.generate_script(meeting_notes, args.script_type, now)
         
         # Determine output path
         if not args.output:
-            from datetime import datetime
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = now.strftime("%Y%m%d_%H%M%S")
             output_filename = f"generated_script_{timestamp}.py"
             os.makedirs(output_dir, exist_ok=True)
             args.output = os.path.join(output_dir, output_filename)
@@ -221,23 +936,10 @@ def main():
         
     except Exception as e:
         print(f"\nError: {str(e)}", file=sys.stderr)
-        print("\nMake sure you have:"
-              "\n1. Set the BARD_API_KEY environment variable"
-              "\n2. Installed the required packages: pip install -r requirements.txt"
-              "\n3. Have a stable internet connection"
-              "\n\nTo get a Bard API key:"
-              "\n1. Go to https://bard.google.com/"
-              "\n2. Sign in with your Google account"
-              "\n3. Open browser developer tools (F12)"
-              "\n4. Go to Application > Cookies"
-              "\n5. Find the cookie named '__Secure-1PSID'"
-              "\n6. Copy its value and set it as BARD_API_KEY"
-              "\n   in your environment: export BARD_API_KEY='your-key-here'"
-              "\n   or in a .env file: BARD_API_KEY=your-key-here",
-              file=sys.stderr)
+        print(_SETUP_HELP, file=sys.stderr)
         return 1
     
     return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())